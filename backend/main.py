@@ -1,23 +1,39 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import google.generativeai as genai
-from pydantic import BaseModel, field_validator
-from typing import List, Optional, Union
+from pydantic import BaseModel, ValidationError, field_validator
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import os
 from dotenv import load_dotenv
 from datetime import datetime
-import json
+import orjson
 import sqlite3
 from pathlib import Path
 import hashlib
-import traceback
+import re
+import io
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import asyncio
+from contextlib import contextmanager
 
 load_dotenv()
 
-app = FastAPI(title="Code Review Assistant API")
+# Handlers run on the listener's thread so logging never writes to stderr from the event loop
+logger = logging.getLogger(__name__)
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = QueueListener(log_queue, _log_handler)
+logger.addHandler(QueueHandler(log_queue))
+logger.propagate = False
+
+app = FastAPI(title="Code Review Assistant API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,12 +43,142 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+if GOOGLE_API_KEY:
+    genai.configure(api_key=GOOGLE_API_KEY)
+
+# Structured output: Gemini returns bare JSON matching this schema, so no markdown to strip
+REVIEW_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "language": {"type": "STRING"},
+        "review_summary": {"type": "STRING"},
+        "readability_score": {"type": "INTEGER"},
+        "modularity_score": {"type": "INTEGER"},
+        "bug_risk_score": {"type": "INTEGER"},
+        "suggestions": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "type": {"type": "STRING"},
+                    "description": {"type": "STRING"},
+                    "line": {"type": "INTEGER"},
+                },
+                "required": ["type", "description"],
+            },
+        },
+        "issues": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "severity": {"type": "STRING"},
+                    "description": {"type": "STRING"},
+                    "line": {"type": "INTEGER"},
+                },
+                "required": ["severity", "description"],
+            },
+        },
+    },
+    "required": [
+        "language", "review_summary", "readability_score", "modularity_score",
+        "bug_risk_score", "suggestions", "issues",
+    ],
+}
+
+# No max_output_tokens: 2.5 Flash spends thinking tokens from the same budget and this SDK
+# cannot cap thinking separately, so any fixed cap risks truncating the JSON on large files.
+# The schema bounds the reply instead, and truncated replies are rejected by finish_reason.
+GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=REVIEW_SCHEMA,
+    temperature=0.2,
+)
+MODEL = genai.GenerativeModel("models/gemini-2.5-flash", generation_config=GENERATION_CONFIG)
+
 DB_PATH = "code_reviews.db"
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+# /review/batch limits: items per request, and Gemini calls in flight across all batches
+MAX_BATCH_SIZE = 20
+BATCH_CONCURRENCY = 4
+
+# Keyed by file extension without the leading dot
+LANGUAGE_MAP: Dict[str, str] = {
+    'py': 'Python', 'js': 'JavaScript', 'ts': 'TypeScript',
+    'java': 'Java', 'cpp': 'C++', 'c': 'C', 'go': 'Go',
+    'rs': 'Rust', 'rb': 'Ruby', 'php': 'PHP', 'swift': 'Swift', 'kt': 'Kotlin'
+}
+
+# Applied to every connection; journal_mode=WAL is persisted in the db file itself
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Pooled connections live for the whole process, so keep every compiled query around
+STATEMENT_CACHE_SIZE = 256
+
+def apply_pragmas(conn: sqlite3.Connection):
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+
+class ConnectionPool:
+    """Fixed-size set of SQLite connections handed out through a queue"""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], size: int):
+        self._all = [connect() for _ in range(size)]
+        self._conns: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=size)
+        for conn in self._all:
+            self._conns.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._conns.get()
+        try:
+            yield conn
+        finally:
+            self._conns.put(conn)
+
+    def close(self):
+        # Close every connection we opened, including any still checked out
+        for conn in self._all:
+            conn.close()
+
+def connect_writer() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    apply_pragmas(conn)
+    return conn
+
+def connect_reader() -> sqlite3.Connection:
+    """Read-only connection; under WAL these run alongside the writer"""
+    conn = sqlite3.connect(
+        f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.row_factory = sqlite3.Row
+    apply_pragmas(conn)
+    return conn
+
+writer_pool: Optional[ConnectionPool] = None
+reader_pool: Optional[ConnectionPool] = None
+
+def with_connection(pool: ConnectionPool, fn, *args):
+    """Check out a connection and run fn(conn, *args); meant to be called via asyncio.to_thread"""
+    with pool.connection() as conn:
+        return fn(conn, *args)
 
 def init_db():
     conn = sqlite3.connect(DB_PATH)
+    apply_pragmas(conn)
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS reviews (
@@ -45,16 +191,40 @@ def init_db():
             readability_score INTEGER,
             modularity_score INTEGER,
             bug_risk_score INTEGER,
-            suggestions TEXT,
-            issues TEXT,
+            suggestions BLOB,
+            issues BLOB,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reviews_hash ON reviews(file_hash)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reviews_created_at ON reviews(created_at DESC)')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_reviews_language ON reviews(language)')
     conn.commit()
     conn.close()
 
 init_db()
 
+@app.on_event("startup")
+def start_logging():
+    log_listener.start()
+
+@app.on_event("startup")
+def open_pools():
+    global writer_pool, reader_pool
+    # SQLite only ever allows one writer at a time
+    writer_pool = ConnectionPool(connect_writer, size=1)
+    reader_pool = ConnectionPool(connect_reader, size=os.cpu_count() or 4)
+
+@app.on_event("shutdown")
+def close_pools():
+    writer_pool.close()
+    reader_pool.close()
+
+# Registered last so the listener flushes anything logged by the other shutdown hooks
+@app.on_event("shutdown")
+def stop_logging():
+    log_listener.stop()
+
 class ReviewResponse(BaseModel):
     id: int
     filename: str
@@ -71,12 +241,16 @@ class ReviewResponse(BaseModel):
     @field_validator('suggestions', 'issues', mode='before')
     @classmethod
     def parse_json_and_normalize(cls, v):
-        # Parse JSON string if needed
-        if isinstance(v, str):
+        # Decode stored JSON: BLOB from orjson, TEXT for rows stored before the switch
+        if isinstance(v, (bytes, str)):
             try:
-                v = json.loads(v)
-            except json.JSONDecodeError:
+                v = orjson.loads(v)
+            except orjson.JSONDecodeError:
                 return []
+
+        # Fast path: rows are normalized to lists of dicts before they are stored
+        if isinstance(v, list) and all(isinstance(item, dict) for item in v):
+            return v
         
         # Ensure it's a list
         if not isinstance(v, list):
@@ -97,30 +271,40 @@ class ReviewRequest(BaseModel):
     filename: str
     language: Optional[str] = None
 
-def get_llm_client():
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY not set")
-    return anthropic.Anthropic(api_key=api_key)
-
-def calculate_file_hash(content: str) -> str:
-    """Calculate SHA256 hash of file content"""
-    return hashlib.sha256(content.encode()).hexdigest()
-
-def save_review_to_db(filename: str, file_hash: str, code: str, analysis: dict) -> int:
-    """Save review results to database"""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+class BatchItemResult(BaseModel):
+    """Outcome of one /review/batch item: the stored review id, or why it failed"""
+    review_id: Optional[int] = None
+    error: Optional[str] = None
 
-    lines_of_code = len([l for l in code.split('\n') if l.strip()])
+class ReviewAnalysis(BaseModel):
+    """Fields a Gemini reply must provide before it is stored as a review"""
+    language: Optional[str] = None
+    review_summary: str
+    readability_score: int
+    modularity_score: int
+    bug_risk_score: int
+    suggestions: List[dict]
+    issues: List[dict]
 
-    c.execute('''
-        INSERT INTO reviews (
-            filename, file_hash, language, lines_of_code,
-            review_summary, readability_score, modularity_score, bug_risk_score,
-            suggestions, issues
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+def calculate_file_hash(content: bytes) -> str:
+    """Calculate SHA256 hash of raw file content"""
+    return hashlib.sha256(content).hexdigest()
+
+INSERT_REVIEW_SQL = '''
+    INSERT INTO reviews (
+        filename, file_hash, language, lines_of_code,
+        review_summary, readability_score, modularity_score, bug_risk_score,
+        suggestions, issues
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def count_lines_of_code(code: str) -> int:
+    """Count non-blank lines without building an intermediate list"""
+    return sum(1 for line in code.splitlines() if line.strip())
+
+def review_row(filename: str, file_hash: str, lines_of_code: int, analysis: dict) -> tuple:
+    """Build the INSERT_REVIEW_SQL parameters for one review"""
+    return (
         filename,
         file_hash,
         analysis.get('language'),
@@ -129,31 +313,62 @@ def save_review_to_db(filename: str, file_hash: str, code: str, analysis: dict)
         analysis.get('readability_score', 0),
         analysis.get('modularity_score', 0),
         analysis.get('bug_risk_score', 0),
-        json.dumps(analysis.get('suggestions', [])),
-        json.dumps(analysis.get('issues', []))
-    ))
-
-    review_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return review_id
-
-
-
-import google.generativeai as genai
-
-def analyze_code_with_llm(code: str, filename: str, language: Optional[str] = None) -> dict:
-    """Analyze code using Google Gemini 2.5 Flash"""
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="GOOGLE_API_KEY not set")
-
-    genai.configure(api_key=api_key)
-
+        orjson.dumps(analysis.get('suggestions', [])),
+        orjson.dumps(analysis.get('issues', []))
+    )
+
+def save_review_to_db(conn: sqlite3.Connection, filename: str, file_hash: str, lines_of_code: int, analysis: dict) -> Tuple[int, str]:
+    """Save review results to database, returning the new id and its created_at"""
+    # Take the write lock up front so a concurrent writer waits on busy_timeout
+    # instead of failing with SQLITE_BUSY when upgrading a read transaction
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        model = genai.GenerativeModel("models/gemini-2.5-flash")
-        
-        prompt = f"""You are an expert code reviewer. Analyze the following code and
+        review_id = conn.execute(
+            INSERT_REVIEW_SQL, review_row(filename, file_hash, lines_of_code, analysis)
+        ).lastrowid
+        # Read the defaulted timestamp inside the same transaction; avoids INSERT ... RETURNING,
+        # which needs SQLite 3.35+ and many system Pythons link an older library
+        created_at = conn.execute('SELECT created_at FROM reviews WHERE id = ?', (review_id,)).fetchone()[0]
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return review_id, created_at
+
+def review_from_analysis(review_id: int, created_at: str, filename: str, lines_of_code: int, analysis: dict) -> ReviewResponse:
+    """Build the response for a freshly saved review without reading it back"""
+    return ReviewResponse(
+        id=review_id,
+        filename=filename,
+        language=analysis.get('language'),
+        lines_of_code=lines_of_code,
+        review_summary=analysis.get('review_summary'),
+        readability_score=analysis.get('readability_score', 0),
+        modularity_score=analysis.get('modularity_score', 0),
+        bug_risk_score=analysis.get('bug_risk_score', 0),
+        suggestions=analysis.get('suggestions', []),
+        issues=analysis.get('issues', []),
+        created_at=created_at
+    )
+
+def save_reviews_to_db(conn: sqlite3.Connection, rows: List[tuple]) -> List[int]:
+    """Insert many reviews in a single transaction and return their ids"""
+    if not rows:
+        return []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(INSERT_REVIEW_SQL, rows)
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    # We hold the only write lock, so AUTOINCREMENT ids in this batch are contiguous
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def build_review_prompt(code: str, filename: str, language: Optional[str] = None) -> str:
+    return f"""You are an expert code reviewer. Analyze the following code and
         return ONLY a valid JSON object (no markdown, no code blocks) in EXACTLY this format:
 
         {{
@@ -188,57 +403,85 @@ def analyze_code_with_llm(code: str, filename: str, language: Optional[str] = No
 ```
         """
 
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if text.startswith('```'):
-            lines = text.split('\n')
-            text = '\n'.join(lines[1:-1]) if len(lines) > 2 else text
-            text = text.replace('```json', '').replace('```', '').strip()
+# Marks the neutral placeholder review so it is never served from the hash cache
+PARSE_FALLBACK_SUMMARY = "Could not parse Gemini output."
 
-        # Try to extract JSON safely
-        start, end = text.find('{'), text.rfind('}') + 1
-        json_str = text[start:end] if start != -1 else "{}"
+CODE_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*\n?(.*?)\n?```\s*$", re.DOTALL)
 
-        try:
-            result = json.loads(json_str)
-            
-            # Ensure suggestions and issues are lists of dicts
-            if 'suggestions' in result and isinstance(result['suggestions'], list):
-                result['suggestions'] = [
-                    s if isinstance(s, dict) else {"type": "general", "description": str(s)}
-                    for s in result['suggestions']
-                ]
-            else:
-                result['suggestions'] = []
-                
-            if 'issues' in result and isinstance(result['issues'], list):
-                result['issues'] = [
-                    i if isinstance(i, dict) else {"severity": "medium", "description": str(i)}
-                    for i in result['issues']
-                ]
-            else:
-                result['issues'] = []
-            
-            return result
+def load_review_json(text: str):
+    """orjson.loads, retrying once on the body of a markdown code fence"""
+    try:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        # Structured output should never be fenced, but recover rather than drop the review
+        match = CODE_FENCE_RE.match(text)
+        if not match:
+            raise
+        return orjson.loads(match.group(1))
+
+def fallback_analysis(language: Optional[str] = None) -> dict:
+    """Neutral placeholder stored when Gemini's reply cannot be used"""
+    return {
+        "language": language or "Unknown",
+        "review_summary": PARSE_FALLBACK_SUMMARY,
+        "readability_score": 5,
+        "modularity_score": 5,
+        "bug_risk_score": 5,
+        "suggestions": [],
+        "issues": []
+    }
+
+def parse_llm_response(text: str, language: Optional[str] = None) -> dict:
+    """Decode Gemini's JSON reply, falling back to neutral scores"""
+    try:
+        result = load_review_json(text)
+        if not isinstance(result, dict):
+            # Valid JSON but not an object (e.g. a bare list or string)
+            logger.warning("Gemini reply is not a JSON object: %.200s...", text)
+            return fallback_analysis(language)
+        
+        # Ensure suggestions and issues are lists of dicts
+        if 'suggestions' in result and isinstance(result['suggestions'], list):
+            result['suggestions'] = [
+                s if isinstance(s, dict) else {"type": "general", "description": str(s)}
+                for s in result['suggestions']
+            ]
+        else:
+            result['suggestions'] = []
             
-        except json.JSONDecodeError as e:
-            print(f"⚠️ JSON parse error: {e}")
-            print(f"⚠️ Received text: {text[:200]}...")
-            return {
-                "language": language or "Unknown",
-                "review_summary": "Could not parse Gemini output.",
-                "readability_score": 5,
-                "modularity_score": 5,
-                "bug_risk_score": 5,
-                "suggestions": [],
-                "issues": []
-            }
+        if 'issues' in result and isinstance(result['issues'], list):
+            result['issues'] = [
+                i if isinstance(i, dict) else {"severity": "medium", "description": str(i)}
+                for i in result['issues']
+            ]
+        else:
+            result['issues'] = []
+        
+        # Reject incomplete replies here; once saved, a row that fails ReviewResponse
+        # validation would be served from the hash cache on every retry
+        return ReviewAnalysis.model_validate(result).model_dump()
+        
+    except (orjson.JSONDecodeError, ValidationError) as e:
+        logger.warning("Unusable Gemini reply: %s; received text: %.200s...", e, text)
+        return fallback_analysis(language)
+
+async def analyze_code_with_llm_async(code: str, filename: str, language: Optional[str] = None) -> dict:
+    """Analyze code using Google Gemini 2.5 Flash"""
+    if not GOOGLE_API_KEY:
+        raise HTTPException(status_code=500, detail="GOOGLE_API_KEY not set")
+
+    try:
+        # Each call awaits its own response; concurrent requests overlap on the event loop
+        response = await MODEL.generate_content_async(build_review_prompt(code, filename, language))
+        # Anything other than a clean stop (MAX_TOKENS, SAFETY, ...) may be cut-off JSON;
+        # fail the request rather than store a degraded review
+        finish_reason = response.candidates[0].finish_reason if response.candidates else None
+        if finish_reason is None or finish_reason.name != "STOP":
+            raise ValueError(f"Gemini stopped early: {getattr(finish_reason, 'name', 'no candidates')}")
+        return parse_llm_response(response.text, language)
 
     except Exception as e:
-        print("⚠️ Gemini error:", e)
-        traceback.print_exc()
+        logger.exception("Gemini error")
         raise HTTPException(status_code=500, detail=f"Gemini analysis failed: {str(e)}")
 @app.get("/")
 def read_root():
@@ -248,89 +491,163 @@ def read_root():
         "endpoints": {
             "POST /review/upload": "Upload code file for review",
             "POST /review/analyze": "Analyze code from request body",
+            "POST /review/batch": "Analyze several code snippets in one request",
             "GET /reviews": "List all reviews",
             "GET /reviews/{id}": "Get specific review"
         }
     }
 
+def _persist_upload(review_id: int, filename: str, content: bytes):
+    """Keep a copy of the uploaded file; runs in the threadpool after the response is sent"""
+    (UPLOAD_DIR / f"{review_id}_{filename}").write_bytes(content)
+
 @app.post("/review/upload", response_model=ReviewResponse)
-async def upload_and_review(file: UploadFile = File(...)):
+async def upload_and_review(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a code file and get AI-powered review"""
     try:
-        content = await file.read()
+        # Hash while reading so the upload is only walked once
+        hasher = hashlib.sha256()
+        buf = io.BytesIO()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            buf.write(chunk)
+        content = buf.getvalue()
+        file_hash = hasher.hexdigest()
+
+        # Identical content was already reviewed; skip Gemini entirely
+        cached = await asyncio.to_thread(with_connection, reader_pool, _find_review_by_hash_sync, file_hash)
+        if cached:
+            return cached
+
         code = content.decode('utf-8', errors='ignore')
 
-        ext = Path(file.filename).suffix.lower()
-        language_map = {
-            '.py': 'Python', '.js': 'JavaScript', '.ts': 'TypeScript',
-            '.java': 'Java', '.cpp': 'C++', '.c': 'C', '.go': 'Go',
-            '.rs': 'Rust', '.rb': 'Ruby', '.php': 'PHP', '.swift': 'Swift', '.kt': 'Kotlin'
-        }
-        language = language_map.get(ext, 'Unknown')
+        # Match Path.suffix: no dot, or only a leading dot (".py"), means no extension
+        stem, sep, ext = file.filename.rpartition('.')
+        language = LANGUAGE_MAP.get(ext.lower(), 'Unknown') if sep and stem else 'Unknown'
 
-        file_hash = calculate_file_hash(code)
-        analysis = analyze_code_with_llm(code, file.filename, language)
-        review_id = save_review_to_db(file.filename, file_hash, code, analysis)
+        analysis = await analyze_code_with_llm_async(code, file.filename, language)
+        lines_of_code = count_lines_of_code(code)
+        # Only hold the single writer for the insert itself, not the LLM call
+        review_id, created_at = await asyncio.to_thread(
+            with_connection, writer_pool, save_review_to_db, file.filename, file_hash, lines_of_code, analysis
+        )
 
-        file_path = UPLOAD_DIR / f"{review_id}_{file.filename}"
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(code)
+        background_tasks.add_task(_persist_upload, review_id, file.filename, content)
 
-        return get_review(review_id)
+        return review_from_analysis(review_id, created_at, file.filename, lines_of_code, analysis)
 
     except Exception as e:
-        print("\n--- ERROR DURING UPLOAD ---")
-        traceback.print_exc()
-        print("----------------------------\n")
+        logger.exception("Error during upload")
         raise HTTPException(status_code=500, detail=f"Internal Error: {str(e)}")
 
 @app.post("/review/analyze", response_model=ReviewResponse)
 async def analyze_code(request: ReviewRequest):
     """Analyze code from request body"""
-    file_hash = calculate_file_hash(request.code)
-    analysis = analyze_code_with_llm(request.code, request.filename, request.language)
-    review_id = save_review_to_db(request.filename, file_hash, request.code, analysis)
-    return get_review(review_id)
+    file_hash = calculate_file_hash(request.code.encode('utf-8'))
+    cached = await asyncio.to_thread(with_connection, reader_pool, _find_review_by_hash_sync, file_hash)
+    if cached:
+        return cached
+
+    analysis = await analyze_code_with_llm_async(request.code, request.filename, request.language)
+    lines_of_code = count_lines_of_code(request.code)
+    review_id, created_at = await asyncio.to_thread(
+        with_connection, writer_pool, save_review_to_db, request.filename, file_hash, lines_of_code, analysis
+    )
+    return review_from_analysis(review_id, created_at, request.filename, lines_of_code, analysis)
+
+# Shared by all batch requests so concurrent batches cannot multiply the Gemini fan-out
+batch_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+@app.post("/review/batch", response_model=List[BatchItemResult])
+async def analyze_batch(requests: List[ReviewRequest]):
+    """Analyze several code snippets and store all new reviews in one transaction"""
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_SIZE} items per batch")
+
+    hashes = [calculate_file_hash(r.code.encode('utf-8')) for r in requests]
+    # Duplicates within the batch share the first occurrence's review
+    unique = {}
+    for r, file_hash in zip(requests, hashes):
+        unique.setdefault(file_hash, r)
+
+    async def review_one(request: ReviewRequest, file_hash: str):
+        """Return a cached review id, or a fresh analysis to insert"""
+        cached = await asyncio.to_thread(with_connection, reader_pool, _find_review_by_hash_sync, file_hash)
+        if cached:
+            return cached.id
+        async with batch_semaphore:
+            return await analyze_code_with_llm_async(request.code, request.filename, request.language)
+
+    # One failed item must not discard the others' (already billed) analyses
+    outcomes = dict(zip(unique, await asyncio.gather(
+        *(review_one(r, file_hash) for file_hash, r in unique.items()),
+        return_exceptions=True
+    )))
+
+    new_hashes = [h for h, outcome in outcomes.items() if isinstance(outcome, dict)]
+    rows = [
+        review_row(unique[h].filename, h, count_lines_of_code(unique[h].code), outcomes[h])
+        for h in new_hashes
+    ]
+    review_ids = {h: outcome for h, outcome in outcomes.items() if isinstance(outcome, int)}
+    review_ids.update(zip(new_hashes, await asyncio.to_thread(with_connection, writer_pool, save_reviews_to_db, rows)))
+
+    results = []
+    for file_hash in hashes:
+        outcome = outcomes[file_hash]
+        if isinstance(outcome, BaseException):
+            detail = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            results.append(BatchItemResult(error=detail))
+        else:
+            results.append(BatchItemResult(review_id=review_ids[file_hash]))
+    return results
+
+def review_from_row(row: sqlite3.Row) -> ReviewResponse:
+    """Convert a reviews row to a response; the validator decodes the stored JSON columns"""
+    return ReviewResponse(**dict(row))
 
 @app.get("/reviews", response_model=List[ReviewResponse])
-def list_reviews(limit: int = 50, offset: int = 0):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+async def list_reviews(limit: int = 50, offset: int = 0):
+    return await asyncio.to_thread(with_connection, reader_pool, _list_reviews_sync, limit, offset)
+
+def _list_reviews_sync(conn: sqlite3.Connection, limit: int, offset: int) -> List[ReviewResponse]:
     c = conn.cursor()
     c.execute('SELECT * FROM reviews ORDER BY created_at DESC LIMIT ? OFFSET ?', (limit, offset))
     rows = c.fetchall()
-    conn.close()
     
-    results = []
-    for row in rows:
-        data = dict(row)
-        data['suggestions'] = json.loads(data['suggestions']) if isinstance(data['suggestions'], str) else data['suggestions']
-        data['issues'] = json.loads(data['issues']) if isinstance(data['issues'], str) else data['issues']
-        results.append(ReviewResponse(**data))
-    
-    return results
+    return [review_from_row(row) for row in rows]
 
 @app.get("/reviews/{review_id}", response_model=ReviewResponse)
-def get_review(review_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+async def get_review(review_id: int):
+    return await asyncio.to_thread(with_connection, reader_pool, _get_review_sync, review_id)
+
+def _get_review_sync(conn: sqlite3.Connection, review_id: int) -> ReviewResponse:
     c = conn.cursor()
     c.execute('SELECT * FROM reviews WHERE id = ?', (review_id,))
     row = c.fetchone()
-    conn.close()
     if not row:
         raise HTTPException(status_code=404, detail="Review not found")
-    
-    # Convert row to dict and parse JSON strings
-    data = dict(row)
-    data['suggestions'] = json.loads(data['suggestions']) if isinstance(data['suggestions'], str) else data['suggestions']
-    data['issues'] = json.loads(data['issues']) if isinstance(data['issues'], str) else data['issues']
-    
-    return ReviewResponse(**data)
+    return review_from_row(row)
+
+def _find_review_by_hash_sync(conn: sqlite3.Connection, file_hash: str) -> Optional[ReviewResponse]:
+    # Skip placeholder reviews so a failed parse is retried rather than cached forever
+    rows = conn.execute(
+        'SELECT * FROM reviews WHERE file_hash = ? AND review_summary IS NOT ? ORDER BY id DESC',
+        (file_hash, PARSE_FALLBACK_SUMMARY)
+    )
+    for row in rows:
+        try:
+            return review_from_row(row)
+        except ValidationError:
+            # Unusable stored row; fall through so Gemini is asked again
+            continue
+    return None
 
 @app.get("/stats")
-def get_stats():
-    conn = sqlite3.connect(DB_PATH)
+async def get_stats():
+    return await asyncio.to_thread(with_connection, reader_pool, _get_stats_sync)
+
+def _get_stats_sync(conn: sqlite3.Connection) -> dict:
     c = conn.cursor()
     c.execute('SELECT COUNT(*) FROM reviews')
     total = c.fetchone()[0]
@@ -338,7 +655,6 @@ def get_stats():
     avg_read, avg_mod, avg_bug = [round(x or 0, 1) for x in c.fetchone()]
     c.execute('SELECT language, COUNT(*) FROM reviews GROUP BY language')
     languages = dict(c.fetchall())
-    conn.close()
     return {
         "total_reviews": total,
         "average_scores": {"readability": avg_read, "modularity": avg_mod, "bug_risk": avg_bug},
@@ -347,4 +663,13 @@ def get_stats():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Workers need an import string rather than the app object
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=os.cpu_count(),
+        loop="uvloop",
+        http="httptools",
+        log_level="info"
+    )